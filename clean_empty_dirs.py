@@ -5,34 +5,73 @@ poistetaanko nämä hakemistot.
 """
 
 import os
-import shutil
 from pathlib import Path
 
 
+def _scan(path, empty_dirs, ds_store_dirs):
+    """Käy hakemiston läpi yhdellä os.scandir-kierroksella ja rekursiivisesti sen alihakemistot.
+
+    Palauttaa (has_subdir, non_ds_file_count, ds_store_seen). Tyhjät hakemistot
+    lisätään listaan empty_dirs ja ne, joissa on .DS_Store, myös joukkoon ds_store_dirs.
+    """
+    has_subdir = False
+    non_ds_file_count = 0
+    ds_store_seen = False
+    subdirs = []
+
+    # DirEntry.is_dir() käyttää hakemistolistauksen välimuistia, joten erillistä stat-kutsua ei tarvita
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    has_subdir = True
+                    subdirs.append(os.fspath(entry))
+                elif entry.name == '.DS_Store' and entry.is_file(follow_symlinks=False):
+                    ds_store_seen = True
+                else:
+                    non_ds_file_count += 1
+    except OSError:
+        # Kuten os.walk: lukukelvoton tai kesken läpikäynnin poistettu hakemisto ohitetaan
+        return has_subdir, non_ds_file_count, ds_store_seen
+
+    # Hakemisto on tyhjä, jos siinä ei ole alihakemistoja eikä muita tiedostoja kuin .DS_Store (macOS)
+    if not has_subdir and non_ds_file_count == 0:
+        empty_dirs.append(Path(path))
+        if ds_store_seen:
+            ds_store_dirs.add(Path(path))
+
+    # Rekursio vasta kun iteraattori on suljettu, jotta avoimia tiedostokahvoja ei kerry
+    for subdir in subdirs:
+        _scan(subdir, empty_dirs, ds_store_dirs)
+
+    return has_subdir, non_ds_file_count, ds_store_seen
+
+
 def find_empty_directories(root_path):
-    """Löytää kaikki tyhjät hakemistot annetun polun alta."""
+    """Löytää kaikki tyhjät hakemistot annetun polun alta.
+
+    Palauttaa (tyhjät hakemistot järjestettynä, hakemistot joissa on vain .DS_Store).
+    """
     empty_dirs = []
+    ds_store_dirs = set()
     root = Path(root_path)
 
     if not root.exists() or not root.is_dir():
         print(f"Virhe: Hakemisto {root_path} ei ole olemassa tai ei ole hakemisto.")
-        return empty_dirs
+        return empty_dirs, ds_store_dirs
 
     # Käy läpi kaikki hakemistot rekursiivisesti
-    for dirpath, dirnames, filenames in os.walk(root_path):
-        dir_path = Path(dirpath)
+    _scan(os.fspath(root_path), empty_dirs, ds_store_dirs)
 
-        # Tarkista onko hakemisto tyhjä (ei tiedostoja eikä hakemistoja)
-        if not dirnames and not filenames:
-            empty_dirs.append(dir_path)
-        # Tarkista onko hakemistossa vain .DS_Store (macOS)
-        elif len(filenames) == 1 and filenames[0] == '.DS_Store' and not dirnames:
-            empty_dirs.append(dir_path)
+    return sorted(empty_dirs), ds_store_dirs
 
-    return sorted(empty_dirs)
 
+def _relative_path(dir_path, prefix_len):
+    """Palauttaa polun suhteessa juurihakemistoon pelkällä merkkijonoleikkauksella."""
+    return os.fspath(dir_path)[prefix_len:] or "."
 
-def ask_user_confirmation(empty_dirs):
+
+def ask_user_confirmation(empty_dirs, root=Path("input")):
     """Kysyy käyttäjältä haluaako poistaa tyhjät hakemistot."""
     if not empty_dirs:
         print("Ei löytynyt tyhjiä hakemistoja input/ alla.")
@@ -41,9 +80,10 @@ def ask_user_confirmation(empty_dirs):
     print(f"\nLöytyi {len(empty_dirs)} tyhjää hakemistoa:")
     print("-" * 50)
 
+    # Näytä suhteellinen polku input/ hakemistosta
+    prefix_len = len(os.fspath(root)) + 1
     for i, dir_path in enumerate(empty_dirs, 1):
-        # Näytä suhteellinen polku input/ hakemistosta
-        rel_path = dir_path.relative_to(Path("input"))
+        rel_path = _relative_path(dir_path, prefix_len)
         print(f"{i:3}. {rel_path}")
 
     print("-" * 50)
@@ -58,24 +98,57 @@ def ask_user_confirmation(empty_dirs):
             print("Vastaa 'k' (kyllä) tai 'e' (ei)")
 
 
-def delete_directories(empty_dirs):
-    """Poistaa annetut hakemistot."""
+def _remove_empty_dir(name, parent_fd, has_ds_store):
+    """Poistaa tyhjän hakemiston (ja sen .DS_Store-tiedoston) vanhemman tiedostokahvan kautta."""
+    if has_ds_store:
+        # unlinkat suhteessa vanhempaan: hakemistoa ei tarvitse avata erikseen
+        try:
+            os.unlink(os.path.join(name, '.DS_Store'), dir_fd=parent_fd)
+        except FileNotFoundError:
+            pass
+    os.rmdir(name, dir_fd=parent_fd)
+
+
+def delete_directories(empty_dirs, ds_store_dirs=frozenset(), root=Path("input")):
+    """Poistaa annetut hakemistot. Joukossa ds_store_dirs olevista poistetaan ensin .DS_Store."""
     deleted_count = 0
     failed_count = 0
+    prefix_len = len(os.fspath(root)) + 1
 
+    # Ryhmittele hakemistot vanhemman mukaan, jotta jokainen vanhempi avataan vain kerran
+    dirs_by_parent = {}
     for dir_path in empty_dirs:
+        dirs_by_parent.setdefault(dir_path.parent, []).append(dir_path)
+
+    for parent, dir_paths in dirs_by_parent.items():
         try:
-            if dir_path.exists():
-                shutil.rmtree(dir_path)
-                rel_path = dir_path.relative_to(Path("input"))
-                print(f"Poistettu: {rel_path}")
-                deleted_count += 1
-            else:
+            parent_fd = os.open(parent, os.O_RDONLY | os.O_DIRECTORY)
+        except FileNotFoundError:
+            for dir_path in dir_paths:
                 print(f"Hakemisto ei ole enää olemassa: {dir_path}")
+            continue
         except Exception as e:
-            rel_path = dir_path.relative_to(Path("input"))
-            print(f"Virhe poistettaessa {rel_path}: {e}")
-            failed_count += 1
+            for dir_path in dir_paths:
+                rel_path = _relative_path(dir_path, prefix_len)
+                print(f"Virhe poistettaessa {rel_path}: {e}")
+                failed_count += 1
+            continue
+
+        try:
+            for dir_path in dir_paths:
+                try:
+                    _remove_empty_dir(dir_path.name, parent_fd, dir_path in ds_store_dirs)
+                    rel_path = _relative_path(dir_path, prefix_len)
+                    print(f"Poistettu: {rel_path}")
+                    deleted_count += 1
+                except FileNotFoundError:
+                    print(f"Hakemisto ei ole enää olemassa: {dir_path}")
+                except Exception as e:
+                    rel_path = _relative_path(dir_path, prefix_len)
+                    print(f"Virhe poistettaessa {rel_path}: {e}")
+                    failed_count += 1
+        finally:
+            os.close(parent_fd)
 
     print(f"\nValmis! Poistettu {deleted_count} hakemistoa.")
     if failed_count > 0:
@@ -84,17 +157,17 @@ def delete_directories(empty_dirs):
 
 def main():
     """Pääohjelma."""
-    input_dir = "input"
+    input_dir = Path("input")
 
     print("Etsitään tyhjiä hakemistoja input/ alla...")
 
     # Etsi tyhjät hakemistot
-    empty_dirs = find_empty_directories(input_dir)
+    empty_dirs, ds_store_dirs = find_empty_directories(input_dir)
 
     # Kysy käyttäjältä haluaako poistaa
-    if ask_user_confirmation(empty_dirs):
+    if ask_user_confirmation(empty_dirs, input_dir):
         print("\nPoistetaan hakemistot...")
-        delete_directories(empty_dirs)
+        delete_directories(empty_dirs, ds_store_dirs, input_dir)
     else:
         print("Peruutettu. Hakemistoja ei poistettu.")
 
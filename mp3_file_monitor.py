@@ -4,39 +4,65 @@ MP3 File Monitor and Transcription System
 Monitors input directory for MP3 files and transcribes them using WhisperX
 """
 
+import atexit
 import os
 import time
 import shutil
 import threading
-import json
+import queue
+import orjson
 import argparse
 from pathlib import Path
+import numpy as np
 import whisperx
+from whisperx.audio import N_SAMPLES
+from whisperx.utils import quantize_dynamic_int8
+from faster_whisper.audio import decode_audio
+from watchfiles import Change, watch
 import gc
 import torch
 from datetime import datetime
 import logging
-
-# Setup logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from collections import OrderedDict
+
+# Setup logging. Records are passed through a queue and written by a
+# background listener thread, so logging never blocks on disk I/O.
+log_queue = queue.Queue(-1)
+log_listener = QueueListener(
+    log_queue,
+    RotatingFileHandler('mp3_file_monitor.log', maxBytes=10_000_000, backupCount=3, encoding='utf-8'),
+    logging.StreamHandler()
+)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('mp3_file_monitor.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(log_queue)]
 )
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# Number of alignment models kept loaded (enough for Finnish and English)
+ALIGN_CACHE_SIZE = 2
+
 class MP3Monitor:
-    def __init__(self, input_dir="./input"):
+    def __init__(self, input_dir="./input", quantize_align=False):
         self.input_dir = Path(input_dir)
+        # int8 alignment on CPU is opt-in until its word timestamps are compared against float32
+        self.quantize_align = quantize_align
         self.processing_lock = threading.Lock()
         self.current_language = None
-        self.model_a = None
-        self.metadata = None
+        # Loaded alignment models by language code, least recently used first
+        self._align_cache = OrderedDict()
         self.setup_whisperx()
 
+        # Transcripts are written by a background thread so that the next file
+        # can be transcribed while the previous one is being saved
+        self._write_q = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+
     def detect_language_from_filename(self, filename):
         """Detect language from filename patterns"""
         filename_lower = filename.lower()
@@ -62,34 +88,69 @@ class MP3Monitor:
         logger.info(f"Compute type: {self.compute_type}")
 
         try:
-            # Load Whisper model
+            # Load Whisper model. whisperx.load_model returns a batched faster-whisper
+            # pipeline: VAD runs once per file and the speech chunks are decoded
+            # batch_size at a time in a single generate() call.
             self.model = whisperx.load_model("large-v3", self.device, compute_type=self.compute_type)
             logger.info("✓ Whisper model loaded successfully")
 
             # Load diarization model
             hftoken = os.getenv("HF_TOKEN")
-            self.diarize_model = whisperx.diarize.DiarizationPipeline(use_auth_token=hftoken, device=self.device)
+            self.diarize_model = whisperx.diarize.DiarizationPipeline(
+                use_auth_token=hftoken, device=self.device, onnx_segmentation=self.device == "cuda"
+            )
             logger.info("✓ Diarization model loaded")
 
             # Note: Alignment model will be loaded dynamically based on detected language
 
+            self.warm_up()
+
         except Exception as e:
             logger.error(f"Error loading models: {e}")
             raise
 
+    def warm_up(self):
+        """Run silent audio through the models so the first real file does not pay the cold-start cost"""
+        logger.info("Warming up models...")
+        warm_up_start = time.time()
+        try:
+            with torch.inference_mode():
+                # VAD + pipeline setup (silence yields no speech segments)
+                self.model.transcribe(np.zeros(16000, dtype=np.float32), batch_size=self.batch_size, language="fi")
+                # Mel filters and Whisper encoder
+                self.model.detect_language(np.zeros(N_SAMPLES, dtype=np.float32))
+            logger.info(f"✓ Models warmed up in {time.time() - warm_up_start:.2f}s")
+        except Exception as e:
+            logger.warning(f"Model warm-up failed, continuing without it: {e}")
+
     def load_alignment_model(self, language_code):
         """Load alignment model for specific language"""
-        if self.current_language != language_code:
+        if language_code in self._align_cache:
+            self._align_cache.move_to_end(language_code)
+            logger.info(f"Alignment model for {language_code} already loaded")
+        else:
             logger.info(f"Loading alignment model for language: {language_code}")
             try:
-                self.model_a, self.metadata = whisperx.load_align_model(language_code=language_code, device=self.device)
-                self.current_language = language_code
+                model_a, metadata = whisperx.load_align_model(language_code=language_code, device=self.device)
+                if self.quantize_align and self.device == "cpu":
+                    # int8 dynamic quantization of the wav2vec2 Linear layers speeds up CPU alignment
+                    try:
+                        model_a = quantize_dynamic_int8(model_a, {torch.nn.Linear})
+                        logger.info("Alignment model quantized to int8 for CPU")
+                    except Exception as e:
+                        logger.warning(f"Alignment model quantization failed, using float32: {e}")
+                self._align_cache[language_code] = (model_a, metadata)
                 logger.info(f"✓ Alignment model loaded for {language_code}")
             except Exception as e:
                 logger.error(f"Error loading alignment model for {language_code}: {e}")
                 raise
-        else:
-            logger.info(f"Alignment model for {language_code} already loaded")
+
+            # Keep at most ALIGN_CACHE_SIZE models in memory
+            while len(self._align_cache) > ALIGN_CACHE_SIZE:
+                evicted_language, _ = self._align_cache.popitem(last=False)
+                logger.info(f"Unloaded alignment model for {evicted_language}")
+
+        self.current_language = language_code
 
     def process_mp3_file(self, file_path):
         """Process a single MP3 file"""
@@ -141,30 +202,43 @@ class MP3Monitor:
         try:
             # Load audio
             logger.info("Loading audio...")
-            audio = whisperx.load_audio(str(mp3_path))
+            # Decode in-process with PyAV (via faster-whisper) instead of piping
+            # raw PCM from an ffmpeg subprocess. All stages share this one array.
+            audio = decode_audio(str(mp3_path), sampling_rate=16000)
             audio_duration = len(audio) / 16000
             logger.info(f"Audio loaded: {audio_duration:.2f} seconds duration")
 
-            # Transcribe with detected language
-            logger.info(f"Transcribing audio (language: {self.current_language})...")
-            transcribe_start = time.time()
-            result = self.model.transcribe(audio, batch_size=self.batch_size, language=self.current_language)
-            transcribe_time = time.time() - transcribe_start
-            logger.info(f"Transcription completed in {transcribe_time:.2f}s ({len(result['segments'])} segments)")
-
-            # Align
-            logger.info("Aligning transcript...")
-            align_start = time.time()
-            result = whisperx.align(result["segments"], self.model_a, self.metadata, audio, self.device, return_char_alignments=False)
-            align_time = time.time() - align_start
-            logger.info(f"Alignment completed in {align_time:.2f}s")
-
-            # Diarize
-            logger.info("Performing speaker diarization...")
-            diarize_start = time.time()
-            diarize_segments = self.diarize_model(audio)
-            diarize_time = time.time() - diarize_start
-            logger.info(f"Diarization completed in {diarize_time:.2f}s")
+            # Copy audio once into pinned host memory so every stage gets fast
+            # DMA transfers to the GPU. The NumPy view shares the same buffer.
+            audio_tensor = torch.from_numpy(audio)
+            if self.device == "cuda":
+                audio_tensor = audio_tensor.pin_memory()
+                audio = audio_tensor.numpy()
+
+            # No autograd bookkeeping is needed for any of the GPU stages
+            # No fp16 autocast: pyannote's fbank features overflow in float16
+            with torch.inference_mode():
+                # Transcribe with detected language
+                logger.info(f"Transcribing audio (language: {self.current_language})...")
+                transcribe_start = time.time()
+                result = self.model.transcribe(audio, batch_size=self.batch_size, language=self.current_language)
+                transcribe_time = time.time() - transcribe_start
+                logger.info(f"Transcription completed in {transcribe_time:.2f}s ({len(result['segments'])} segments)")
+
+                # Align
+                logger.info("Aligning transcript...")
+                align_start = time.time()
+                model_a, metadata = self._align_cache[self.current_language]
+                result = whisperx.align(result["segments"], model_a, metadata, audio_tensor, self.device, return_char_alignments=False)
+                align_time = time.time() - align_start
+                logger.info(f"Alignment completed in {align_time:.2f}s")
+
+                # Diarize
+                logger.info("Performing speaker diarization...")
+                diarize_start = time.time()
+                diarize_segments = self.diarize_model(audio)
+                diarize_time = time.time() - diarize_start
+                logger.info(f"Diarization completed in {diarize_time:.2f}s")
 
             # Assign speakers
             logger.info("Assigning speakers to words...")
@@ -173,15 +247,16 @@ class MP3Monitor:
             assign_time = time.time() - assign_start
             logger.info(f"Speaker assignment completed in {assign_time:.2f}s")
 
-            # Save results
-            self.save_transcript(result, mp3_path, output_dir, audio_duration, start_time)
+            # Save results in the writer thread
+            processing_time = time.time() - start_time
+            self._write_q.put((result, mp3_path, output_dir, audio_duration, processing_time, self.current_language))
 
-            # Cleanup
+            # Cleanup: drop the decoded audio before collecting
+            del audio, audio_tensor
             gc.collect()
             if self.device == "cuda":
                 torch.cuda.empty_cache()
 
-            processing_time = time.time() - start_time
             speed_ratio = audio_duration / processing_time
             logger.info(f"✓ Transcription completed for {mp3_path.name}")
             logger.info(f"Processing time: {processing_time:.2f}s (speed ratio: {speed_ratio:.2f}x)")
@@ -190,91 +265,108 @@ class MP3Monitor:
             logger.error(f"Error during transcription of {mp3_path.name}: {e}")
             raise
 
-    def save_transcript(self, result, mp3_path, output_dir, audio_duration, start_time):
-        """Save transcript to file"""
+    def _writer_loop(self):
+        """Save queued transcripts one at a time"""
+        while True:
+            result, mp3_path, output_dir, audio_duration, processing_time, language = self._write_q.get()
+            try:
+                self.save_transcript(result, mp3_path, output_dir, audio_duration, processing_time, language)
+            except Exception as e:
+                logger.error(f"Error saving transcript for {mp3_path.name}: {e}")
+                # Save error log to target directory, as process_mp3_file does for earlier steps
+                try:
+                    error_file = output_dir / "error.log"
+                    with open(error_file, 'w', encoding='utf-8') as f:
+                        f.write(f"Error processing {mp3_path.name}\n")
+                        f.write(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                        f.write(f"Error: {str(e)}\n")
+                except OSError as log_error:
+                    # Keep the writer thread alive for the remaining transcripts
+                    logger.error(f"Could not write error log for {mp3_path.name}: {log_error}")
+            finally:
+                self._write_q.task_done()
+
+    def wait_for_writes(self):
+        """Block until all queued transcripts have been saved"""
+        self._write_q.join()
+
+    def save_transcript(self, result, mp3_path, output_dir, audio_duration, processing_time, language):
+        """Save transcript in .txt, .md and .json formats"""
         # Use base filename without extension for output files
         base_filename = mp3_path.stem
         transcript_file = output_dir / f"{base_filename}.txt"
         markdown_file = output_dir / f"{base_filename}.md"
         json_file = output_dir / f"{base_filename}.json"
 
-        processing_time = time.time() - start_time
         speed_ratio = audio_duration / processing_time
+        generated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        # Build both text files in memory and write each with a single call
+        txt_parts = [
+            f"Diarized Transcript - {generated}\n",
+            f"Audio file: {mp3_path.name}\n",
+            f"Language: {language}\n",
+            f"Device: {self.device}\n",
+            f"Duration: {audio_duration:.2f} seconds\n",
+            f"Processing time: {processing_time:.2f} seconds\n",
+            f"Speed ratio: {speed_ratio:.2f}x\n",
+            "=" * 50 + "\n\n",
+        ]
+        md_parts = [
+            "# Diarized Transcript\n\n",
+            f"**Audio file:** {mp3_path.name}  \n",
+            f"**Language:** {language}  \n",
+            f"**Device:** {self.device}  \n",
+            f"**Duration:** {audio_duration:.2f} seconds  \n",
+            f"**Processing time:** {processing_time:.2f} seconds  \n",
+            f"**Speed ratio:** {speed_ratio:.2f}x  \n",
+            f"**Generated:** {generated}  \n\n",
+            "---",
+        ]
+
+        # Single pass over the segments feeds both formats, in chronological order
+        current_speaker = None
+        for i, segment in enumerate(result["segments"]):
+            speaker = segment.get('speaker', 'UNKNOWN')
+            start_time_seg = segment['start']
+            end_time_seg = segment['end']
+            text = segment['text']
+
+            # .txt: one numbered line per segment
+            txt_parts.append(f"[{i + 1:03d}] {speaker} ({start_time_seg:.2f}s-{end_time_seg:.2f}s): {text}\n")
+
+            # .md: add speaker header when speaker changes
+            if speaker != current_speaker:
+                start_time_str = time.strftime('%H:%M:%S', time.gmtime(start_time_seg))
+                md_parts.append(f"\n\n## {speaker} ({start_time_str})\n\n")
+                current_speaker = speaker
+
+            # .md: only write non-empty text
+            text = text.strip()
+            if text:
+                md_parts.append(text + " ")
 
-        # Save .txt format (existing)
         with open(transcript_file, 'w', encoding='utf-8') as f:
-            f.write(f"Diarized Transcript - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Audio file: {mp3_path.name}\n")
-            f.write(f"Language: {self.current_language}\n")
-            f.write(f"Device: {self.device}\n")
-            f.write(f"Duration: {audio_duration:.2f} seconds\n")
-            f.write(f"Processing time: {processing_time:.2f} seconds\n")
-            f.write(f"Speed ratio: {speed_ratio:.2f}x\n")
-            f.write("=" * 50 + "\n\n")
-
-            for i, segment in enumerate(result["segments"]):
-                speaker = segment.get('speaker', 'UNKNOWN')
-                start_time_seg = segment['start']
-                end_time_seg = segment['end']
-                text = segment['text']
-                f.write(f"[{i + 1:03d}] {speaker} ({start_time_seg:.2f}s-{end_time_seg:.2f}s): {text}\n")
-
-        # Save .md format (new)
-        self.save_markdown_transcript(result, mp3_path, markdown_file, audio_duration, start_time)
-
-        # Save .json format (new)
-        self.save_json_transcript(result, mp3_path, json_file, audio_duration, start_time)
+            f.write("".join(txt_parts))
+
+        with open(markdown_file, 'w', encoding='utf-8') as f:
+            f.write("".join(md_parts))
+
+        # Save .json format (segments are serialized as-is)
+        self.save_json_transcript(result, mp3_path, json_file, audio_duration, processing_time, language)
 
         logger.info(f"Transcript saved to {transcript_file}")
         logger.info(f"Markdown transcript saved to {markdown_file}")
         logger.info(f"JSON transcript saved to {json_file}")
 
-    def save_markdown_transcript(self, result, mp3_path, markdown_file, audio_duration, start_time):
-        """Save transcript in markdown format in chronological order"""
-        processing_time = time.time() - start_time
-        speed_ratio = audio_duration / processing_time
-
-        with open(markdown_file, 'w', encoding='utf-8') as f:
-            # Write header information
-            f.write(f"# Diarized Transcript\n\n")
-            f.write(f"**Audio file:** {mp3_path.name}  \n")
-            f.write(f"**Language:** {self.current_language}  \n")
-            f.write(f"**Device:** {self.device}  \n")
-            f.write(f"**Duration:** {audio_duration:.2f} seconds  \n")
-            f.write(f"**Processing time:** {processing_time:.2f} seconds  \n")
-            f.write(f"**Speed ratio:** {speed_ratio:.2f}x  \n")
-            f.write(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  \n\n")
-            f.write("---")
-
-            # Write segments in chronological order
-            current_speaker = None
-            for i, segment in enumerate(result["segments"]):
-                speaker = segment.get('speaker', 'UNKNOWN')
-                start_time_seg = segment['start']
-                end_time_seg = segment['end']
-                text = segment['text'].strip()
-
-                # Add speaker header when speaker changes
-                if speaker != current_speaker:
-                    start_time_str = time.strftime('%H:%M:%S', time.gmtime(start_time_seg))
-                    f.write(f"\n\n## {speaker} ({start_time_str})\n\n")
-                    current_speaker = speaker
-
-                # Write the segment text
-                if text:  # Only write non-empty text
-                    if not text.endswith(" "):
-                        text += " "
-                    f.write(f"{text}")
-
-    def save_json_transcript(self, result, mp3_path, json_file, audio_duration, start_time):
+    def save_json_transcript(self, result, mp3_path, json_file, audio_duration, processing_time, language):
         """Save transcript in JSON format"""
-        processing_time = time.time() - start_time
         speed_ratio = audio_duration / processing_time
 
         # Prepare JSON data
         json_data = {
             "audio_file": mp3_path.name,
-            "language": self.current_language,
+            "language": language,
             "device": self.device,
             "duration": audio_duration,
             "processing_time": processing_time,
@@ -283,24 +375,29 @@ class MP3Monitor:
             "generated": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
 
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=4)
+        # orjson writes UTF-8 directly and handles numpy scalars from alignment output
+        with open(json_file, 'wb') as f:
+            f.write(orjson.dumps(
+                json_data,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+            ))
 
     def process_existing_files(self, input_dir):
         """Process any existing MP3 files in the input directory"""
-        input_path = Path(input_dir)
-        mp3_files = list(input_path.glob("*.mp3"))
+        with os.scandir(input_dir) as it:
+            mp3_files = [entry.path for entry in it
+                         if entry.is_file() and entry.name.lower().endswith(".mp3")]
 
         if mp3_files:
             logger.info(f"Found {len(mp3_files)} existing MP3 file(s) to process:")
             for mp3_file in mp3_files:
-                logger.info(f"  - {mp3_file.name}")
-                self.process_mp3_file(str(mp3_file))
+                logger.info(f"  - {os.path.basename(mp3_file)}")
+                self.process_mp3_file(mp3_file)
         else:
             logger.info("No existing MP3 files found in input directory")
 
     def monitor_directory(self, input_dir):
-        """Monitor the input directory for new MP3 files"""
+        """Process existing MP3 files, then monitor the input directory for new ones"""
         logger.info(f"Monitoring directory: {input_dir.absolute()}")
         logger.info("Language detection:")
         logger.info("  - Files with '-en.mp3' or '-en-' in filename: English transcription")
@@ -309,22 +406,63 @@ class MP3Monitor:
         logger.info("Press Ctrl+C to stop monitoring")
 
         try:
-            while True:
-                # Check for new MP3 files
-                input_path = Path(input_dir)
-                mp3_files = list(input_path.glob("*.mp3"))
-
-                for mp3_file in mp3_files:
+            # Wait for file system events from the OS (inotify/FSEvents/ReadDirectoryChangesW)
+            # instead of rescanning the directory on a fixed polling interval
+            changes_iter = watch(input_dir, watch_filter=self._mp3_added_filter, recursive=False, step=500,
+                                 rust_timeout=1000, yield_on_timeout=True)
+            existing_processed = False
+            for changes in changes_iter:
+                # The first yield means the watcher is running. Files dropped while the
+                # existing ones are transcribed are buffered and arrive as later events.
+                if not existing_processed:
+                    self.process_existing_files(input_dir)
+                    existing_processed = True
+                for _, path in sorted(changes):
+                    # Already picked up and moved by process_existing_files
+                    if not os.path.exists(path):
+                        continue
+                    mp3_file = Path(path)
                     logger.info(f"New MP3 file detected: {mp3_file.name}")
+                    # The file may still be copied when the creation event arrives
+                    if not self._wait_stable(path):
+                        logger.warning(f"File {mp3_file.name} disappeared before it finished writing, skipping")
+                        continue
                     self.process_mp3_file(str(mp3_file))
 
-                time.sleep(5)  # Polling interval
-
         except KeyboardInterrupt:
             logger.info("Stopping directory monitor...")
         except Exception as e:
             logger.error(f"Error monitoring directory: {e}")
 
+    @staticmethod
+    def _wait_stable(path, interval=0.1, stable_rounds=2):
+        """Wait until file size stays unchanged for stable_rounds consecutive samples.
+
+        There is no timeout: copies over slow network links can take minutes, and
+        no later event would bring back a file that was given up on.
+        Returns False only if the file disappears.
+        """
+        last_size = -1
+        stable = 0
+        while True:
+            try:
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                return False
+            if size == last_size:
+                stable += 1
+                if stable >= stable_rounds:
+                    return True
+            else:
+                last_size = size
+                stable = 0
+            time.sleep(interval)
+
+    @staticmethod
+    def _mp3_added_filter(change, path):
+        """Only react to MP3 files appearing in the input directory"""
+        return change == Change.added and path.lower().endswith(".mp3")
+
 def main():
     """Main function to start file monitoring"""
     # Parse command line arguments
@@ -335,6 +473,11 @@ def main():
         default="./input",
         help="Input directory to monitor for MP3 files (default: ./input)"
     )
+    parser.add_argument(
+        "--quantize-align",
+        action="store_true",
+        help="Quantize the alignment model to int8 on CPU (faster, word timestamps may shift slightly)"
+    )
     args = parser.parse_args()
 
     # Ensure input directory exists
@@ -346,14 +489,14 @@ def main():
     logger.info("=" * 50)
 
     # Create event handler and observer
-    event_handler = MP3Monitor(input_dir=args.input_dir)
+    event_handler = MP3Monitor(input_dir=args.input_dir, quantize_align=args.quantize_align)
 
-    # Process any existing files in the input directory
-    event_handler.process_existing_files(input_dir)
-
-    # Start monitoring
+    # Process any existing files in the input directory and start monitoring
     event_handler.monitor_directory(input_dir)
 
+    # Let pending transcripts finish writing before exiting
+    event_handler.wait_for_writes()
+
     logger.info("File monitor stopped")
 
 if __name__ == "__main__":
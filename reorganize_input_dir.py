@@ -11,139 +11,165 @@ Rules:
 - Archive directories and their subdirectories are excluded from organization
 """
 
+import functools
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Directory scans are I/O bound, so many threads help on network mounts
+CLASSIFY_WORKERS = 32
 
 
 def extract_identifier(directory_name: str) -> str:
     """Extract identifier word from directory name."""
-    if '-' not in directory_name:
+    # Take the text between the first and second '-'
+    _, sep, rest = directory_name.partition('-')
+    if not sep:
         return ""
 
-    # Split by '-' and take the second part
-    parts = directory_name.split('-')
-    if len(parts) < 2:
-        return ""
+    # Remove everything after '.' if present
+    return rest.partition('-')[0].partition('.')[0]
 
-    identifier = parts[1]
 
-    # Remove everything after '.' if present
-    if '.' in identifier:
-        identifier = identifier.split('.')[0]
+class DirInfo(NamedTuple):
+    """Result of a single scan of one directory.
+
+    subdirs is only collected for directories without .mp3 files, since only
+    organization directories need it.
+    """
+    has_mp3: bool
+    subdirs: Tuple[str, ...]
+    identifier: str
+
+
+@functools.lru_cache(maxsize=None)
+def _classify(path: str) -> Optional[DirInfo]:
+    identifier = extract_identifier(os.path.basename(path))
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith('.mp3') and entry.is_file():
+                    # A transcript directory: stop at the first .mp3
+                    return DirInfo(True, (), identifier)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
 
-    return identifier
+    return DirInfo(False, tuple(subdirs), identifier)
+
+
+def classify(path: Path) -> Optional[DirInfo]:
+    """Scan directory once and cache the result. Returns None if path is not a directory."""
+    return _classify(os.fspath(path))
 
 
 def is_transcript_directory(path: Path) -> bool:
     """Check if directory contains .mp3 files (transcript directory)."""
-    if not path.is_dir():
-        return False
-
-    for file in path.iterdir():
-        if file.suffix.lower() == '.mp3':
-            return True
-    return False
+    info = classify(path)
+    return info is not None and info.has_mp3
 
 
 def is_organization_directory(path: Path) -> bool:
     """Check if directory contains only subdirectories and no .mp3 files. Empty directories are also considered organization directories."""
-    if not path.is_dir():
-        return False
-
     # Organization directory names should not contain dash characters
     if '-' in path.name:
         return False
 
-    # Check that there are no .mp3 files
-    for item in path.iterdir():
-        if item.is_file() and item.suffix.lower() == '.mp3':
-            return False
-
-    # If we get here, there are no .mp3 files, so it's an organization directory
-    # (whether it's empty or contains only subdirectories)
-    return True
+    # Empty directories and directories with only subdirectories are organization directories
+    info = classify(path)
+    return info is not None and not info.has_mp3
 
 
 def is_archive_directory(path: Path) -> bool:
     """Check if directory is an archive directory (contains 'arkisto' or 'archive' in name)."""
-    if not path.is_dir():
-        return False
-
     name_lower = path.name.lower()
     return 'arkisto' in name_lower or 'archive' in name_lower
 
 
-def is_under_archive_directory(path: Path, input_path: Path) -> bool:
-    """Check if directory is under any archive directory."""
-    # Get all parent directories up to input_path
-    current = path.parent
-    while current != input_path and current != current.parent:
-        if is_archive_directory(current):
-            return True
-        current = current.parent
-    return False
+def _iter_subdirectories(input_path: Path) -> Iterator[Path]:
+    """Yield subdirectories directly under input path using a single scandir pass."""
+    with os.scandir(input_path) as it:
+        for entry in it:
+            if entry.is_dir():
+                yield Path(entry.path)
 
 
-def find_organization_directories(input_path: Path) -> Dict[str, Path]:
+def find_organization_directories(input_path: Path, subdirectories: Optional[List[Path]] = None) -> Dict[str, Path]:
     """Find all organization directories and their identifiers."""
     org_dirs = {}
 
-    for item in input_path.iterdir():
-        if item.is_dir() and is_organization_directory(item):
-            # Skip archive directories
-            if is_archive_directory(item):
-                continue
-
-            # Skip directories under archive directories
-            if is_under_archive_directory(item, input_path):
-                continue
-
-            # Check if the organization directory name is directly an identifier
-            # (e.g., "ilmassa")
-            org_dirs[item.name] = item
-
-            # Also check if it contains an identifier with dashes
-            # (e.g., "category-ilmassa-something")
-            identifier = extract_identifier(item.name)
-            if identifier:
-                org_dirs[identifier] = item
-
-            # Check subdirectories of organization directory
-            for subdir in item.iterdir():
-                if subdir.is_dir() and is_organization_directory(subdir):
-                    # Skip if subdirectory is an archive or under an archive
-                    if is_archive_directory(subdir) or is_under_archive_directory(subdir, input_path):
-                        continue
-
-                    # Subdirectory name as identifier - map to the subdirectory itself
-                    org_dirs[subdir.name] = subdir
-
-                    # Subdirectory identifier with dashes - map to the subdirectory itself
-                    sub_identifier = extract_identifier(subdir.name)
-                    if sub_identifier:
-                        org_dirs[sub_identifier] = subdir
+    if subdirectories is None:
+        subdirectories = list(_iter_subdirectories(input_path))
+
+    for item in subdirectories:
+        # Skip archive directories
+        if is_archive_directory(item) or not is_organization_directory(item):
+            continue
+
+        # Organization directory names never contain dashes, so the name itself
+        # is the identifier (e.g., "ilmassa")
+        org_dirs[item.name] = item
+
+        # Check subdirectories of organization directory and map their names to
+        # the subdirectory itself. The parent was already checked above, so a
+        # subdirectory can only be archived by its own name.
+        for subdir_path in classify(item).subdirs:
+            subdir = Path(subdir_path)
+            if not is_archive_directory(subdir) and is_organization_directory(subdir):
+                org_dirs[subdir.name] = subdir
 
     return org_dirs
 
 
-def find_transcript_directories(input_path: Path) -> List[Tuple[Path, str]]:
+def find_transcript_directories(input_path: Path, subdirectories: Optional[List[Path]] = None) -> List[Tuple[Path, str]]:
     """Find transcript directories directly under input path."""
     transcript_dirs = []
 
-    for item in input_path.iterdir():
-        if item.is_dir() and is_transcript_directory(item):
-            identifier = extract_identifier(item.name)
-            if identifier:
-                transcript_dirs.append((item, identifier))
+    if subdirectories is None:
+        subdirectories = list(_iter_subdirectories(input_path))
+
+    for item in subdirectories:
+        info = classify(item)
+        if info is not None and info.has_mp3 and info.identifier:
+            transcript_dirs.append((item, info.identifier))
 
     return transcript_dirs
 
 
+def prefetch_classifications(subdirectories: List[Path]) -> None:
+    """Classify directories in parallel so that latency of network file systems overlaps.
+
+    Results are stored in the classify() cache. Subdirectories of possible
+    organization directories are classified as soon as their parent is done.
+    """
+    with ThreadPoolExecutor(max_workers=CLASSIFY_WORKERS) as executor:
+        futures = {executor.submit(classify, item): item for item in subdirectories}
+        nested_futures = []
+
+        for future in as_completed(futures):
+            item = futures[future]
+            info = future.result()
+            if info is not None and not info.has_mp3 and '-' not in item.name and not is_archive_directory(item):
+                nested_futures.extend(executor.submit(classify, Path(path)) for path in info.subdirs)
+
+        for future in as_completed(nested_futures):
+            future.result()
+
+
 def plan_moves(input_path: Path) -> List[Tuple[Path, Path]]:
     """Plan all directory moves."""
-    org_dirs = find_organization_directories(input_path)
-    transcript_dirs = find_transcript_directories(input_path)
+    # Directory contents may have changed since a previous plan
+    _classify.cache_clear()
+
+    subdirectories = list(_iter_subdirectories(input_path))
+    prefetch_classifications(subdirectories)
+
+    org_dirs = find_organization_directories(input_path, subdirectories)
+    transcript_dirs = find_transcript_directories(input_path, subdirectories)
 
     moves = []
 
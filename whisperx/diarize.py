@@ -1,3 +1,6 @@
+import hashlib
+import os
+
 import numpy as np
 import pandas as pd
 from pyannote.audio import Pipeline
@@ -9,12 +12,86 @@ from whisperx.types import TranscriptionResult, AlignedTranscriptionResult
 from whisperx.utils import suppress_reproducibility_warnings
 
 
+class OnnxSegmentationModel(torch.nn.Module):
+    """
+    Runs the forward pass of a pyannote segmentation model with ONNX Runtime.
+    Everything else (specifications, receptive_field, ...) is delegated to the
+    wrapped pyannote model so it can replace it inside pyannote's Inference.
+    """
+
+    def __init__(self, model: torch.nn.Module, onnx_path: str, providers: list[str]):
+        import onnxruntime
+
+        super().__init__()
+        self.model = model
+        self.session = onnxruntime.InferenceSession(onnx_path, providers=providers)
+
+    def __getattr__(self, name):
+        try:
+            return super().__getattr__(name)
+        except AttributeError:
+            return getattr(super().__getattr__("model"), name)
+
+    def forward(self, waveforms: torch.Tensor) -> torch.Tensor:
+        waveforms = waveforms.contiguous()
+        if waveforms.is_cuda:
+            # Feed the CUDA buffer directly to avoid a round trip through host memory
+            torch.cuda.current_stream(waveforms.device).synchronize()
+            binding = self.session.io_binding()
+            binding.bind_input(
+                "waveforms",
+                device_type="cuda",
+                device_id=waveforms.device.index or 0,
+                element_type=np.float32,
+                shape=tuple(waveforms.shape),
+                buffer_ptr=waveforms.data_ptr(),
+            )
+            binding.bind_output("scores", device_type="cpu")
+            self.session.run_with_iobinding(binding)
+            scores = binding.copy_outputs_to_cpu()[0]
+        else:
+            scores = self.session.run(["scores"], {"waveforms": waveforms.numpy()})[0]
+        return torch.from_numpy(scores).to(waveforms.device)
+
+
+def export_segmentation_onnx(model: torch.nn.Module, cache_dir: Optional[str] = None) -> str:
+    """
+    Export a pyannote segmentation model to ONNX, caching the file by a hash
+    of the model weights so the export only happens once per model.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(torch.hub._get_torch_home(), "whisperx", "onnx")
+
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().numpy().tobytes())
+    onnx_path = os.path.join(cache_dir, f"segmentation-{digest.hexdigest()[:16]}.onnx")
+
+    if not os.path.exists(onnx_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{onnx_path}.{os.getpid()}.tmp"
+        torch.onnx.export(
+            model,
+            model.example_input_array.to(model.device),
+            tmp_path,
+            input_names=["waveforms"],
+            output_names=["scores"],
+            dynamic_axes={"waveforms": {0: "batch"}, "scores": {0: "batch"}},
+            opset_version=17,
+        )
+        os.replace(tmp_path, onnx_path)
+
+    return onnx_path
+
+
 class DiarizationPipeline:
     def __init__(
         self,
         model_name=None,
         use_auth_token=None,
         device: Optional[Union[str, torch.device]] = "cpu",
+        onnx_segmentation: bool = False,
     ):
         if isinstance(device, str):
             device = torch.device(device)
@@ -23,6 +100,9 @@ class DiarizationPipeline:
         model_config = model_name or "pyannote/speaker-diarization-3.1"
         self.model = Pipeline.from_pretrained(model_config, use_auth_token=use_auth_token).to(device)
 
+        if onnx_segmentation:
+            self._use_onnx_segmentation(device)
+
         # Re-enable TF32 after pyannote modified it
         try:
             from whisperx.utils import enable_tf32
@@ -31,6 +111,27 @@ class DiarizationPipeline:
         except Exception:
             pass
 
+    def _use_onnx_segmentation(self, device: torch.device):
+        """Run the segmentation model with ONNX Runtime on CUDA; clustering stays in pyannote."""
+        try:
+            import onnxruntime
+        except ImportError:
+            print("onnxruntime is not installed, using PyTorch for diarization segmentation")
+            return
+
+        if device.type != "cuda" or "CUDAExecutionProvider" not in onnxruntime.get_available_providers():
+            print("ONNX Runtime CUDA provider not available, using PyTorch for diarization segmentation")
+            return
+
+        inference = self.model._segmentation
+        try:
+            onnx_path = export_segmentation_onnx(inference.model)
+            inference.model = OnnxSegmentationModel(
+                inference.model, onnx_path, providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
+            )
+        except Exception as e:
+            print(f"Failed to set up ONNX segmentation, using PyTorch instead: {e}")
+
     def __call__(
         self,
         audio: Union[str, np.ndarray],
@@ -467,3 +467,16 @@ def suppress_reproducibility_warnings():
         add_safe_globals([ListConfig])
     except Exception:
         pass
+
+
+def quantize_dynamic_int8(model, layer_types):
+    """Dynamically quantize the given layer types of a model to int8 for CPU inference.
+
+    Selects qnnpack when no quantized engine is active, as on macOS arm64
+    builds of torch. Raises if quantization is not possible; the model passed
+    in is left unchanged.
+    """
+    backends = torch.backends.quantized
+    if backends.engine == "none" and "qnnpack" in backends.supported_engines:
+        backends.engine = "qnnpack"
+    return torch.ao.quantization.quantize_dynamic(model, layer_types, dtype=torch.qint8)
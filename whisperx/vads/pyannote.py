@@ -1,5 +1,5 @@
 import os
-from typing import Callable, Text, Union
+from typing import Callable, Text, Tuple, Union
 from typing import Optional
 
 import numpy as np
@@ -10,13 +10,24 @@ from pyannote.audio.pipelines import VoiceActivityDetection
 from pyannote.audio.pipelines.utils import PipelineModel
 from pyannote.core import Annotation, SlidingWindowFeature
 from pyannote.core import Segment
+from pyannote.core.segment import SEGMENT_PRECISION
 
 from whisperx.diarize import Segment as SegmentX
 from whisperx.vads.vad import Vad
-from whisperx.utils import suppress_reproducibility_warnings
+from whisperx.utils import quantize_dynamic_int8, suppress_reproducibility_warnings
 
+try:
+    import numba
+    from numba import prange
+except ImportError:
+    numba = None
+    prange = range
 
-def load_vad_model(device, vad_onset=0.500, vad_offset=0.363, use_auth_token=None, model_fp=None):
+# Loaded VAD pipelines, keyed by checkpoint path, mtime, device, thresholds and quantization
+_VAD_PIPELINE_CACHE: dict = {}
+
+
+def load_vad_model(device, vad_onset=0.500, vad_offset=0.363, use_auth_token=None, model_fp=None, vad_quantize=True):
     model_dir = torch.hub._get_torch_home()
 
     main_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -36,10 +47,22 @@ def load_vad_model(device, vad_onset=0.500, vad_offset=0.363, use_auth_token=Non
     if os.path.exists(model_fp) and not os.path.isfile(model_fp):
         raise RuntimeError(f"{model_fp} exists and is not a regular file")
 
-    model_bytes = open(model_fp, "rb").read()
+    quantize = vad_quantize and torch.device(device).type == "cpu"
+    cache_key = (model_fp, os.path.getmtime(model_fp), str(device), vad_onset, vad_offset, quantize)
+    if cache_key in _VAD_PIPELINE_CACHE:
+        return _VAD_PIPELINE_CACHE[cache_key]
 
     suppress_reproducibility_warnings()
     vad_model = Model.from_pretrained(model_fp, use_auth_token=use_auth_token)
+    quantized = False
+    if quantize:
+        # int8 dynamic quantization of the LSTM and Linear layers speeds up CPU inference.
+        # Conv1d has no dynamically quantized counterpart, so SincNet stays in float32.
+        try:
+            vad_model = quantize_dynamic_int8(vad_model, {torch.nn.Linear, torch.nn.LSTM})
+            quantized = True
+        except Exception as e:
+            print(f">>int8 quantization of the VAD model failed, using float32: {e}")
     hyperparameters = {"onset": vad_onset,
                     "offset": vad_offset,
                     "min_duration_on": 0.1,
@@ -47,6 +70,10 @@ def load_vad_model(device, vad_onset=0.500, vad_offset=0.363, use_auth_token=Non
     vad_pipeline = VoiceActivitySegmentation(segmentation=vad_model, device=torch.device(device))
     vad_pipeline.instantiate(hyperparameters)
 
+    # inductor does not handle the dynamically quantized LSTM well
+    if not quantized:
+        _compile_segmentation(vad_pipeline)
+
     # Re-enable TF32 after pyannote modified it
     try:
         from whisperx.utils import enable_tf32
@@ -55,8 +82,122 @@ def load_vad_model(device, vad_onset=0.500, vad_offset=0.363, use_auth_token=Non
     except Exception:
         pass
 
+    # Compile the binarization kernel now rather than on the first file
+    if numba is not None:
+        _binarize_kernel(np.zeros((2, 1), dtype=np.float32), np.zeros(2), np.float32(0.5), np.float32(0.5), False, 0.0)
+
+    # a float32 fallback is cached as unquantized
+    _VAD_PIPELINE_CACHE[cache_key[:-1] + (quantized,)] = vad_pipeline
     return vad_pipeline
 
+
+def _compile_segmentation(vad_pipeline):
+    """Compile the forward of the segmentation model and warm it up with a dummy batch.
+
+    Only forward is replaced, as pyannote's get_model rejects the wrapper
+    module returned by torch.compile. Falls back to eager mode on failure.
+    """
+    inference = vad_pipeline._segmentation
+    model = inference.model
+    model.forward = torch.compile(model.forward, mode="reduce-overhead")
+    try:
+        num_samples = model.audio.get_num_samples(inference.duration)
+        # under the same autocast state as apply, so the graph is not recompiled
+        with vad_pipeline.autocast():
+            inference.infer(torch.zeros((inference.batch_size, model.hparams.num_channels, num_samples)))
+    except Exception as e:
+        print(f">>torch.compile of the VAD model failed, using eager mode: {e}")
+        del model.forward
+
+
+def _binarize_kernel(scores, timestamps, onset, offset, split, max_duration):
+    """Hysteresis thresholding with min-cut splitting, see `Binarize`.
+
+    Works on frame indices instead of Python lists: the current segment is a
+    [lo, hi) window into a preallocated scratch buffer, so splitting it only
+    moves a cursor. Classes are independent and run in parallel, each writing
+    to its own rows of the buffers. Returns the (start_idx, end_idx, class_idx)
+    frame indices of the active regions. Segments are only split at
+    max_duration when split is True, so an infinite max_duration never
+    reaches the comparison. Compiled with numba when available.
+    """
+    num_frames, num_classes = scores.shape
+    # a class has at most one region per frame
+    class_starts = np.empty((num_classes, num_frames), dtype=np.int32)
+    class_ends = np.empty((num_classes, num_frames), dtype=np.int32)
+    class_counts = np.zeros(num_classes, dtype=np.int64)
+    curr = np.empty((num_classes, num_frames), dtype=np.int32)
+
+    for k in prange(num_classes):
+        count = 0
+        # initial state
+        start = 0
+        is_active = scores[0, k] > onset
+        curr[k, 0] = 0
+        lo = 0
+        hi = 1
+        for i in range(1, num_frames):
+            # currently active
+            if is_active:
+                if split and timestamps[i] - timestamps[start] > max_duration:
+                    # divide segment at the lowest score in its second half
+                    min_pos = lo + (hi - lo) // 2
+                    min_score = scores[curr[k, min_pos], k]
+                    for j in range(min_pos + 1, hi):
+                        # like np.argmin, the first NaN is the minimum
+                        if np.isnan(min_score):
+                            break
+                        score = scores[curr[k, j], k]
+                        if score < min_score or np.isnan(score):
+                            min_score = score
+                            min_pos = j
+                    class_starts[k, count] = start
+                    class_ends[k, count] = curr[k, min_pos]
+                    count += 1
+                    start = curr[k, min_pos]
+                    lo = min_pos + 1
+                # switching from active to inactive
+                elif scores[i, k] < offset:
+                    class_starts[k, count] = start
+                    class_ends[k, count] = i
+                    count += 1
+                    start = i
+                    is_active = False
+                    lo = hi
+                curr[k, hi] = i
+                hi += 1
+            # switching from inactive to active
+            elif scores[i, k] > onset:
+                start = i
+                is_active = True
+
+        # if active at the end, add final region
+        if is_active:
+            class_starts[k, count] = start
+            class_ends[k, count] = num_frames - 1
+            count += 1
+        class_counts[k] = count
+
+    # concatenate the regions in class order
+    total = class_counts.sum()
+    start_idx = np.empty(total, dtype=np.int32)
+    end_idx = np.empty(total, dtype=np.int32)
+    class_idx = np.empty(total, dtype=np.int32)
+    pos = 0
+    for k in range(num_classes):
+        count = class_counts[k]
+        start_idx[pos:pos + count] = class_starts[k, :count]
+        end_idx[pos:pos + count] = class_ends[k, :count]
+        class_idx[pos:pos + count] = k
+        pos += count
+    return start_idx, end_idx, class_idx
+
+
+if numba is not None:
+    # no fastmath: scores may contain NaN and must compare like in the Python loop
+    _binarize_kernel = numba.njit(cache=True, parallel=True)(_binarize_kernel)
+
+
 class Binarize:
     """Binarize detection scores using hysteresis thresholding, with min-cut operation
     to ensure not segments are longer than max_duration.
@@ -114,70 +255,36 @@ class Binarize:
 
         self.max_duration = max_duration
 
-    def __call__(self, scores: SlidingWindowFeature) -> Annotation:
+    def __call__(self, scores: SlidingWindowFeature, return_sorted: bool = False):
         """Binarize detection scores
         Parameters
         ----------
         scores : SlidingWindowFeature
             Detection scores.
+        return_sorted : bool, optional
+            Also return the (start, end) tuples of the sorted, distinct
+            segments, i.e. the `get_timeline()` segments without building
+            the timeline. Defaults to False.
         Returns
         -------
         active : Annotation
             Binarized scores.
+        sorted_segs : list of (float, float) tuples
+            Only when `return_sorted` is True.
         """
 
-        num_frames, num_classes = scores.data.shape
-        frames = scores.sliding_window
-        timestamps = [frames[i].middle for i in range(num_frames)]
-
-        # annotation meant to store 'active' regions
-        active = Annotation()
-        for k, k_scores in enumerate(scores.data.T):
+        active = self._to_annotation(scores, *self._regions(scores))
 
-            label = k if scores.labels is None else scores.labels[k]
+        # no post-processing is configured e.g. in Pyannote.merge_chunks
+        if self._has_post_processing():
+            active = self._post_process(active)
 
-            # initial state
-            start = timestamps[0]
-            is_active = k_scores[0] > self.onset
-            curr_scores = [k_scores[0]]
-            curr_timestamps = [start]
-            t = start
-            for t, y in zip(timestamps[1:], k_scores[1:]):
-                # currently active
-                if is_active:
-                    curr_duration = t - start
-                    if curr_duration > self.max_duration:
-                        search_after = len(curr_scores) // 2
-                        # divide segment
-                        min_score_div_idx = search_after + np.argmin(curr_scores[search_after:])
-                        min_score_t = curr_timestamps[min_score_div_idx]
-                        region = Segment(start - self.pad_onset, min_score_t + self.pad_offset)
-                        active[region, k] = label
-                        start = curr_timestamps[min_score_div_idx]
-                        curr_scores = curr_scores[min_score_div_idx + 1:]
-                        curr_timestamps = curr_timestamps[min_score_div_idx + 1:]
-                    # switching from active to inactive
-                    elif y < self.offset:
-                        region = Segment(start - self.pad_onset, t + self.pad_offset)
-                        active[region, k] = label
-                        start = t
-                        is_active = False
-                        curr_scores = []
-                        curr_timestamps = []
-                    curr_scores.append(y)
-                    curr_timestamps.append(t)
-                # currently inactive
-                else:
-                    # switching from inactive to active
-                    if y > self.onset:
-                        start = t
-                        is_active = True
-
-            # if active at the end, add final region
-            if is_active:
-                region = Segment(start - self.pad_onset, t + self.pad_offset)
-                active[region, k] = label
+        if return_sorted:
+            # annotation segments are kept sorted, distinct and non-empty
+            return active, [(segment.start, segment.end) for segment in active.itersegments()]
+        return active
 
+    def _post_process(self, active: Annotation) -> Annotation:
         # because of padding, some active regions might be overlapping: merge them.
         # also: fill same speaker gaps shorter than min_duration_off
         if self.pad_offset > 0.0 or self.pad_onset > 0.0 or self.min_duration_off > 0.0:
@@ -193,6 +300,197 @@ class Binarize:
 
         return active
 
+    def to_arrays(self, scores: SlidingWindowFeature) -> Tuple[np.ndarray, np.ndarray]:
+        """Binarize detection scores into start and end time arrays
+
+        Same regions as `self(scores, return_sorted=True)`: sorted, distinct
+        and non-empty. Without post-processing no annotation is built.
+        """
+        if self._has_post_processing():
+            _, sorted_segs = self(scores, return_sorted=True)
+            sorted_segs = np.array(sorted_segs, dtype=np.float64).reshape(-1, 2)
+            return sorted_segs[:, 0], sorted_segs[:, 1]
+
+        starts, ends, _ = self._regions(scores)
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+
+        # drop empty regions, then sort and deduplicate like Timeline
+        non_empty = (ends - starts) > SEGMENT_PRECISION
+        starts, ends = starts[non_empty], ends[non_empty]
+        order = np.lexsort((ends, starts))
+        starts, ends = starts[order], ends[order]
+        distinct = np.ones(len(starts), dtype=bool)
+        distinct[1:] = (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1])
+        return starts[distinct], ends[distinct]
+
+    def _has_post_processing(self) -> bool:
+        return bool(self.pad_onset or self.pad_offset or self.min_duration_off or self.min_duration_on)
+
+    def _regions(self, scores: SlidingWindowFeature) -> Tuple[list, list, list]:
+        """(start, end, class) lists of the unpadded active regions."""
+        num_frames = scores.data.shape[0]
+        frames = scores.sliding_window
+        # frames[i].middle for every frame, with the same float operations
+        frame_starts = frames.start + np.arange(num_frames) * frames.step
+        timestamps = 0.5 * (frame_starts + (frame_starts + frames.duration))
+
+        if self.max_duration == float("inf") and self.offset <= self.onset:
+            return self._binarize_vectorized(scores, timestamps)
+        elif numba is not None:
+            return self._binarize_numba(scores, timestamps)
+        else:
+            return self._binarize_python(scores, timestamps)
+
+    def _to_annotation(self, scores: SlidingWindowFeature, starts, ends, classes) -> Annotation:
+        """Build the annotation of padded active regions in one go."""
+        labels = scores.labels
+        records = []
+        for start, end, k in zip(starts, ends, classes):
+            region = Segment(start - self.pad_onset, end + self.pad_offset)
+            # like `active[region, k] = label`, skip empty regions
+            if region:
+                records.append((region, k, k if labels is None else labels[k]))
+        return Annotation.from_records(records)
+
+    def _binarize_vectorized(self, scores: SlidingWindowFeature, timestamps) -> Tuple[list, list, list]:
+        """Plain hysteresis thresholding with NumPy, no max_duration splitting.
+
+        With offset <= onset a frame can not be both above onset and below
+        offset, so the state of every frame is the last of those events at or
+        before it, which is a forward fill. Returns the (start, end, class)
+        lists of the active regions.
+        """
+        num_frames = scores.data.shape[0]
+        frame_idx = np.arange(num_frames)
+
+        region_starts, region_ends, region_classes = [], [], []
+        for k, k_scores in enumerate(scores.data.T):
+
+            # +1 switches on, -1 switches off, 0 keeps the previous state
+            events = (k_scores > self.onset).astype(np.int8) - (k_scores < self.offset)
+            # the first frame always sets the initial state
+            events[0] = 1 if k_scores[0] > self.onset else -1
+            last_event = np.maximum.accumulate(np.where(events != 0, frame_idx, 0))
+            state = (events[last_event] == 1).astype(np.int8)
+
+            # a region ends at the first inactive frame, or at the last frame
+            edges = np.diff(state)
+            starts = np.flatnonzero(edges == 1) + 1
+            ends = np.flatnonzero(edges == -1) + 1
+            if state[0]:
+                starts = np.concatenate(([0], starts))
+            if state[-1]:
+                ends = np.append(ends, num_frames - 1)
+
+            region_starts.extend(timestamps[starts].tolist())
+            region_ends.extend(timestamps[ends].tolist())
+            region_classes.extend([k] * len(starts))
+        return region_starts, region_ends, region_classes
+
+    def _binarize_numba(self, scores: SlidingWindowFeature, timestamps) -> Tuple[list, list, list]:
+        """Run the compiled kernel and return the (start, end, class) lists of the active regions."""
+        data = np.ascontiguousarray(scores.data)
+        # compare in the dtype of the scores, like the NumPy scalars in the Python loop
+        onset = data.dtype.type(self.onset)
+        offset = data.dtype.type(self.offset)
+        split = self.max_duration < float("inf")
+        max_duration = float(self.max_duration) if split else 0.0
+        start_idx, end_idx, class_idx = _binarize_kernel(data, timestamps, onset, offset, split, max_duration)
+        return timestamps[start_idx].tolist(), timestamps[end_idx].tolist(), class_idx.tolist()
+
+    def _binarize_python(self, scores: SlidingWindowFeature, timestamps) -> Tuple[list, list, list]:
+        """Pure Python fallback used when numba is not installed.
+
+        Instead of stepping through every frame, the frames that can switch
+        the state (above onset, below offset) are found with NumPy up front
+        and the loop jumps from one state change or max_duration split to the
+        next. The frames of the current segment are always an optional carried
+        frame (where the previous segment ended) followed by the contiguous
+        range [first, i), so a split takes argmin over a view of the scores.
+        Returns the (start, end, class) lists of the active regions.
+        """
+        num_frames = len(timestamps)
+        # Python floats are faster than NumPy scalars in the loop below
+        ts = timestamps.tolist()
+
+        # 'active' regions
+        region_starts, region_ends, region_classes = [], [], []
+        for k, k_scores in enumerate(scores.data.T):
+
+            # frames after the first one where the state may switch
+            onset_frames = np.flatnonzero(k_scores[1:] > self.onset) + 1
+            offset_frames = np.flatnonzero(k_scores[1:] < self.offset) + 1
+
+            # initial state
+            start = ts[0]
+            is_active = k_scores[0] > self.onset
+            carry = -1 if is_active else 0
+            first = 0
+            i = 0
+            while True:
+                # currently inactive: switch to active at the next frame above onset
+                if not is_active:
+                    n = np.searchsorted(onset_frames, i, side="right")
+                    if n == len(onset_frames):
+                        break
+                    i = int(onset_frames[n])
+                    start = ts[i]
+                    is_active = True
+                    first = i + 1
+                    continue
+
+                # next frame below offset
+                n = np.searchsorted(offset_frames, i, side="right")
+                off = int(offset_frames[n]) if n < len(offset_frames) else num_frames
+
+                # next frame more than max_duration after start; searchsorted compares
+                # sums, the loop differences, so correct for rounding
+                split = max(int(np.searchsorted(timestamps, start + self.max_duration, side="right")), i + 1)
+                while split > i + 1 and ts[split - 1] - start > self.max_duration:
+                    split -= 1
+                while split < num_frames and not ts[split] - start > self.max_duration:
+                    split += 1
+
+                # splitting takes precedence over switching to inactive on the same frame
+                if split < num_frames and split <= off:
+                    i = split
+                    has_carry = carry >= 0
+                    search_after = (has_carry + i - first) // 2
+                    # divide segment
+                    if has_carry and search_after == 0:
+                        # only the carried frame is in the segment
+                        div = carry
+                    else:
+                        div_first = first + search_after - has_carry
+                        div = div_first + int(np.argmin(k_scores[div_first:i]))
+                        first = div + 1
+                    carry = -1
+                    min_score_t = ts[div]
+                    region_starts.append(start)
+                    region_ends.append(min_score_t)
+                    region_classes.append(k)
+                    start = min_score_t
+                # switching from active to inactive
+                elif off < num_frames:
+                    i = off
+                    region_starts.append(start)
+                    region_ends.append(ts[i])
+                    region_classes.append(k)
+                    start = ts[i]
+                    is_active = False
+                    carry = i
+                else:
+                    break
+
+            # if active at the end, add final region
+            if is_active:
+                region_starts.append(start)
+                region_ends.append(ts[-1])
+                region_classes.append(k)
+
+        return region_starts, region_ends, region_classes
+
 
 class VoiceActivitySegmentation(VoiceActivityDetection):
     def __init__(
@@ -205,6 +503,10 @@ class VoiceActivitySegmentation(VoiceActivityDetection):
 
         super().__init__(segmentation=segmentation, fscore=fscore, use_auth_token=use_auth_token, **inference_kwargs)
 
+    def autocast(self):
+        """Run segmentation in float16 on CUDA, the output is thresholded so the precision loss is absorbed."""
+        return torch.autocast("cuda", dtype=torch.float16, enabled=self._segmentation.device.type == "cuda")
+
     def apply(self, file: AudioFile, hook: Optional[Callable] = None) -> Annotation:
         """Apply voice activity detection
 
@@ -231,10 +533,12 @@ class VoiceActivitySegmentation(VoiceActivityDetection):
             if self.CACHED_SEGMENTATION in file:
                 segmentations = file[self.CACHED_SEGMENTATION]
             else:
-                segmentations = self._segmentation(file)
+                with self.autocast():
+                    segmentations = self._segmentation(file)
                 file[self.CACHED_SEGMENTATION] = segmentations
         else:
-            segmentations: SlidingWindowFeature = self._segmentation(file)
+            with self.autocast():
+                segmentations: SlidingWindowFeature = self._segmentation(file)
 
         return segmentations
 
@@ -244,14 +548,17 @@ class Pyannote(Vad):
     def __init__(self, device, use_auth_token=None, model_fp=None, **kwargs):
         print(">>Performing voice activity detection using Pyannote...")
         super().__init__(kwargs['vad_onset'])
-        self.vad_pipeline = load_vad_model(device, use_auth_token=use_auth_token, model_fp=model_fp)
+        self.vad_pipeline = load_vad_model(device, use_auth_token=use_auth_token, model_fp=model_fp,
+                                           vad_quantize=kwargs.get('vad_quantize', True))
 
     def __call__(self, audio: AudioFile, **kwargs):
         return self.vad_pipeline(audio)
 
     @staticmethod
     def preprocess_audio(audio):
-        return torch.from_numpy(audio).unsqueeze(0)
+        # zero-copy for float32 arrays and tensors; pyannote expects (channel, time)
+        waveform = torch.as_tensor(audio, dtype=torch.float32)
+        return waveform.unsqueeze(0) if waveform.dim() == 1 else waveform
 
     @staticmethod
     def merge_chunks(segments,
@@ -261,13 +568,59 @@ class Pyannote(Vad):
                      ):
         assert chunk_size > 0
         binarize = Binarize(max_duration=chunk_size, onset=onset, offset=offset)
-        segments = binarize(segments)
-        segments_list = []
-        for speech_turn in segments.get_timeline():
-            segments_list.append(SegmentX(speech_turn.start, speech_turn.end, "UNKNOWN"))
+        starts, ends = binarize.to_arrays(segments)
 
-        if len(segments_list) == 0:
+        if len(starts) == 0:
             print("No active speech found in audio")
             return []
-        assert segments_list, "segments_list is empty."
+
+        # the fast merge needs ends that grow with starts, as with the single VAD class
+        if starts[0] >= 0 and np.all(ends[1:] >= ends[:-1]):
+            return Pyannote.merge_chunks_fast(starts, ends, chunk_size, onset, offset)
+
+        segments_list = [SegmentX(start, end, "UNKNOWN") for start, end in zip(starts.tolist(), ends.tolist())]
         return Vad.merge_chunks(segments_list, chunk_size, onset, offset)
+
+    @staticmethod
+    def merge_chunks_fast(starts: np.ndarray,
+                          ends: np.ndarray,
+                          chunk_size,
+                          onset: float = 0.5,
+                          offset: Optional[float] = None,
+                          ):
+        """
+        Vad.merge_chunks on sorted, non-empty segments with non-decreasing ends
+
+        Then the segment that closes a chunk is found with a binary search
+        instead of a loop over all segments.
+        """
+        num_segments = len(starts)
+        seg_idxs = list(zip(starts.tolist(), ends.tolist()))
+        merged_segments = []
+
+        first = 0
+        while True:
+            curr_start = starts[first]
+            # first segment after `first` that ends more than chunk_size after curr_start
+            last = max(int(np.searchsorted(ends, curr_start + chunk_size, side="right")), first + 1)
+            # searchsorted compares sums, merge_chunks differences: correct for rounding
+            while last > first + 1 and ends[last - 1] - curr_start > chunk_size:
+                last -= 1
+            while last < num_segments and not ends[last] - curr_start > chunk_size:
+                last += 1
+            if last == num_segments:
+                break
+            merged_segments.append({
+                "start": seg_idxs[first][0],
+                "end": seg_idxs[last - 1][1],
+                "segments": seg_idxs[first:last],
+            })
+            first = last
+        # add final
+        merged_segments.append({
+            "start": seg_idxs[first][0],
+            "end": seg_idxs[-1][1],
+            "segments": seg_idxs[first:],
+        })
+
+        return merged_segments